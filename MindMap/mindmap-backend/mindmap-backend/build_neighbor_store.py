@@ -0,0 +1,105 @@
+"""
+Build the offline neighbor store read by flask_server.py.
+
+Runs expand_word_to_pool, get_wordnet_categories, get_word_category and
+detect_semantic_domain over every WordNet lemma in a process pool and writes
+the results to a SQLite file. Point NEIGHBOR_STORE_PATH at the output to make
+the Flask service look words up there before computing them live.
+
+Usage:
+    python build_neighbor_store.py neighbors.sqlite [--workers 8]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from multiprocessing import Pool
+
+# The builder must always compute live, never read an older store
+os.environ.pop("NEIGHBOR_STORE_PATH", None)
+
+from flask_server import (
+    NEIGHBOR_STORE_MAX_EXPANSIONS,
+    NEIGHBOR_STORE_VERSION,
+    detect_semantic_domain,
+    expand_word_to_pool,
+    get_word_category,
+    get_wordnet_categories,
+    wordnet,
+)
+
+
+def all_wordnet_words():
+    """Every WordNet lemma in the form the server sees it (lowercase, spaces not underscores)."""
+    return sorted({name.replace('_', ' ').lower() for name in wordnet.all_lemma_names()})
+
+
+def compute_entry(word):
+    entry = {
+        "pool": expand_word_to_pool(word, max_expansions=NEIGHBOR_STORE_MAX_EXPANSIONS),
+        "categories": get_wordnet_categories(word),
+        "category": get_word_category(word),
+        "domains": detect_semantic_domain(word),
+    }
+    return word, json.dumps(entry, separators=(",", ":"))
+
+
+def _init_worker():
+    wordnet.ensure_loaded()
+
+
+def build(output, workers, chunksize=256, batch=5000):
+    words = all_wordnet_words()
+    print(f"Computing neighbor entries for {len(words)} words with {workers} workers...")
+    started = time.time()
+
+    tmp_path = output + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE words (word TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID")
+
+    rows = []
+    done = 0
+    with Pool(processes=workers, initializer=_init_worker) as pool:
+        for row in pool.imap_unordered(compute_entry, words, chunksize=chunksize):
+            rows.append(row)
+            if len(rows) >= batch:
+                conn.executemany("INSERT INTO words VALUES (?, ?)", rows)
+                done += len(rows)
+                rows = []
+                print(f"  {done}/{len(words)} words ({time.time() - started:.0f}s)")
+    if rows:
+        conn.executemany("INSERT INTO words VALUES (?, ?)", rows)
+        done += len(rows)
+
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("version", NEIGHBOR_STORE_VERSION),
+        ("wordnet", wordnet.get_version()),
+        ("max_expansions", str(NEIGHBOR_STORE_MAX_EXPANSIONS)),
+        ("words", str(done)),
+    ])
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp_path, output)
+    print(f"Wrote {done} entries to {output} in {time.time() - started:.0f}s.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute WordNet neighbors for the Flask service.")
+    parser.add_argument("output", help="path of the SQLite store to write")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    build(args.output, max(1, args.workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
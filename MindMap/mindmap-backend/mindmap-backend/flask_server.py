@@ -1,10 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, make_response
 from transformers import pipeline
 from langdetect import detect
 from deep_translator import GoogleTranslator
 import nltk
 from nltk.corpus import wordnet
 import requests
+import os
+import json
+import sqlite3
+import threading
+import sys
+import time
+import uuid
+import hmac
+import random
+import functools
+import heapq
+import tracemalloc
+from collections import Counter
 
 app = Flask(__name__)
 
@@ -33,6 +46,47 @@ except LookupError:
 
 CONCEPTNET_API_URL = "http://api.conceptnet.io/c/en/"
 
+# ✅ Connection engine settings
+# rules        -> WordNet rules only (find_connection)
+# vectors      -> static word-vector similarity only
+# union        -> linked if either engine links the pair
+# intersection -> linked only if both engines agree
+CONNECTION_MODES = ("rules", "vectors", "union", "intersection")
+CONNECTION_MODE = os.environ.get("CONNECTION_MODE", "rules").lower()
+if CONNECTION_MODE not in CONNECTION_MODES:
+    print(f"⚠️ Unknown CONNECTION_MODE '{CONNECTION_MODE}' (expected one of {', '.join(CONNECTION_MODES)}); using 'rules'.")
+    CONNECTION_MODE = "rules"
+WORD_VECTORS_PATH = os.environ.get("WORD_VECTORS_PATH")              # .npy matrix, one row per vocab word
+WORD_VECTORS_VOCAB = os.environ.get("WORD_VECTORS_VOCAB")            # text file, one word per line
+VECTOR_THRESHOLD = float(os.environ.get("VECTOR_THRESHOLD", "0.45"))  # min cosine similarity to link
+VECTOR_TOP_K = int(os.environ.get("VECTOR_TOP_K", "0"))              # max vector links per node (0 = no cap)
+
+# ✅ Constellation size budget (requests may ask for less via max_nodes / max_edges; 0 = unlimited)
+MAX_NODES = int(os.environ.get("MAX_NODES", "80"))
+MAX_EDGES = int(os.environ.get("MAX_EDGES", "400"))
+# With an edge budget, stop the rule scan once it has found this many links per budgeted edge
+EDGE_SCAN_FACTOR = int(os.environ.get("EDGE_SCAN_FACTOR", "4"))
+
+# ✅ Precomputed neighbor store (built offline by build_neighbor_store.py)
+NEIGHBOR_STORE_PATH = os.environ.get("NEIGHBOR_STORE_PATH")
+# Bump whenever expand_word_to_pool / get_wordnet_categories / get_word_category /
+# detect_semantic_domain change, so stale stores are ignored instead of served.
+NEIGHBOR_STORE_VERSION = "1"
+NEIGHBOR_STORE_MAX_EXPANSIONS = 12
+
+# ✅ Opt-in request profiling (toggle at runtime via /admin/profiling)
+PROFILE_MODES = ("sample", "cprofile")
+PROFILE_HEADER = "X-MindMap-Profile"                                  # "1"/"true" + admin token forces a profile
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN")           # required by /admin/profiling
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_RUNS = int(os.environ.get("PROFILE_MAX_RUNS", "50"))      # older runs are deleted
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+profiling_settings = {
+    "enabled": os.environ.get("PROFILE_ENABLED", "false").lower() in ("1", "true", "yes"),
+    "sample_rate": float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),   # fraction of requests, 0..1
+    "mode": os.environ.get("PROFILE_MODE", "sample").lower(),          # sample | cprofile
+}
+
 # ✅ Comprehensive job database with semantic field mappings
 JOB_DATABASE = {
     'animal': ['Veterinarian', 'Animal Trainer', 'Zoologist', 'Wildlife Biologist', 'Zookeeper', 'Pet Groomer', 'Animal Behaviorist', 'Marine Biologist', 'Aquarist', 'Animal Control Officer', 'Livestock Manager', 'Dairy Farmer', 'Rancher', 'Animal Nutritionist', 'Veterinary Technician'],
@@ -89,7 +143,60 @@ def clean_label(label):
     return label.strip().lower().replace("a ", "").replace("an ", "").replace("the ", "")
 
 
+# ✅ Neighbor store lookups (one read-only SQLite connection per thread)
+_store_local = threading.local()
+_store_usable = None    # False only once the store has failed the version check
+_store_retry_at = 0.0   # after an open error, don't retry before this time
+NEIGHBOR_STORE_RETRY_SECONDS = 30
+
+def _open_neighbor_store():
+    global _store_usable, _store_retry_at
+    if not NEIGHBOR_STORE_PATH or _store_usable is False:
+        return None
+    conn = getattr(_store_local, "conn", None)
+    if conn is not None:
+        return conn
+    if time.time() < _store_retry_at:
+        return None
+    conn = None
+    try:
+        conn = sqlite3.connect(f"file:{NEIGHBOR_STORE_PATH}?mode=ro", uri=True)
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.Error as e:
+        # Missing (still being built) or locked: treat as a miss and try again later
+        if conn is not None:
+            conn.close()
+        print(f"Neighbor store unavailable ({e}); using live WordNet computation, "
+              f"retrying in {NEIGHBOR_STORE_RETRY_SECONDS}s.")
+        _store_retry_at = time.time() + NEIGHBOR_STORE_RETRY_SECONDS
+        return None
+    if meta.get("version") != NEIGHBOR_STORE_VERSION or meta.get("wordnet") != wordnet.get_version():
+        print(f"Neighbor store {NEIGHBOR_STORE_PATH} is stale "
+              f"(version {meta.get('version')}, wordnet {meta.get('wordnet')}); using live WordNet computation.")
+        conn.close()
+        _store_usable = False
+        return None
+    _store_usable = True
+    _store_local.conn = conn
+    return conn
+
+
+def get_stored_word(word):
+    """Return the precomputed entry for `word` from the neighbor store, or None on a miss."""
+    conn = _open_neighbor_store()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute("SELECT data FROM words WHERE word = ?", (word.lower(),)).fetchone()
+    except sqlite3.Error:
+        return None
+    return json.loads(row[0]) if row else None
+
+
 def get_wordnet_categories(word):
+    stored = get_stored_word(word)
+    if stored is not None:
+        return list(stored["categories"])
     synsets = wordnet.synsets(word)
     # Use the second part of lexname when available (e.g. 'noun.person' -> 'person')
     cats = []
@@ -245,6 +352,11 @@ def expand_word_to_pool(word, max_expansions=12):
     Expand a word to related words dynamically using WordNet relations and definition mining.
     Works for ANY word, not just predefined ones.
     """
+    if max_expansions <= NEIGHBOR_STORE_MAX_EXPANSIONS:
+        stored = get_stored_word(word)
+        if stored is not None:
+            return stored["pool"][:max_expansions]
+
     expanded = set()
     word_lower = word.lower()
     
@@ -337,6 +449,9 @@ def get_word_category(word):
     Get the main semantic category of a word (noun.animal, noun.food, verb.action, etc.)
     Returns string like 'animal', 'food', 'plant', 'action', etc.
     """
+    stored = get_stored_word(word)
+    if stored is not None:
+        return stored["category"]
     try:
         synsets = wordnet.synsets(word.lower())
         if not synsets:
@@ -353,7 +468,84 @@ def get_word_category(word):
         return None
 
 
-def find_connection(word_a, word_b):
+def detect_semantic_domain(word):
+    """Dynamically detect semantic domain for ANY word using WordNet analysis"""
+    stored = get_stored_word(word)
+    if stored is not None:
+        return list(stored["domains"])
+    domains = []
+    try:
+        synsets = wordnet.synsets(word.lower())
+        if not synsets:
+            return domains
+        
+        syn = synsets[0]  # Most common meaning
+        definition = syn.definition().lower()
+        lexname = syn.lexname()  # e.g., 'noun.animal', 'verb.motion'
+        
+        # Extract domain from lexname
+        if '.' in lexname:
+            category = lexname.split('.')[1]
+            domains.append(category)
+        
+        # Analyze hypernym chain (up to 3 levels)
+        current = syn
+        for _ in range(3):
+            hypers = current.hypernyms()
+            if not hypers:
+                break
+            current = hypers[0]
+            hyper_lexname = current.lexname()
+            if '.' in hyper_lexname:
+                cat = hyper_lexname.split('.')[1]
+                domains.append(cat)
+        
+        # Mine definition for domain keywords
+        domain_keywords = {
+            'animal': ['animal', 'mammal', 'creature', 'livestock', 'fauna', 'vertebrate', 'beast'],
+            'plant': ['plant', 'vegetation', 'flora', 'tree', 'flower', 'crop', 'botanical'],
+            'food': ['food', 'nutrient', 'dish', 'meal', 'beverage', 'drink', 'edible', 'cuisine'],
+            'health': ['medicine', 'treatment', 'disease', 'health', 'medical', 'therapy', 'cure'],
+            'technology': ['device', 'machine', 'computer', 'software', 'digital', 'electronic', 'system'],
+            'science': ['science', 'research', 'study', 'analysis', 'experiment', 'theory'],
+            'art': ['art', 'creative', 'design', 'aesthetic', 'visual', 'artistic'],
+            'music': ['music', 'sound', 'audio', 'instrument', 'melody', 'song'],
+            'business': ['business', 'commerce', 'trade', 'market', 'company', 'enterprise'],
+            'engineering': ['engineering', 'construction', 'build', 'structure', 'technical'],
+            'education': ['education', 'teaching', 'learning', 'school', 'instruction'],
+            'communication': ['communication', 'language', 'speech', 'writing', 'media'],
+            'social': ['social', 'people', 'community', 'society', 'human'],
+            'law': ['law', 'legal', 'court', 'justice', 'attorney'],
+            'transportation': ['vehicle', 'transport', 'travel', 'motion', 'conveyance'],
+            'environment': ['environment', 'ecology', 'nature', 'climate', 'conservation'],
+            'finance': ['finance', 'money', 'bank', 'investment', 'economic', 'financial'],
+            'sport': ['sport', 'athletic', 'fitness', 'exercise', 'game', 'competition'],
+        }
+        
+        for domain, keywords in domain_keywords.items():
+            if any(kw in definition for kw in keywords):
+                domains.append(domain)
+        
+    except Exception:
+        pass
+    
+    return list(set(domains))
+
+
+# Rule strengths used to rank links when an edge budget applies (rules are checked in this order)
+RULE_STRENGTH = {
+    "dairy": 0.8,
+    "substring": 1.0,
+    "same_category": 0.6,
+    "definition": 0.9,
+    "bridge_keyword": 0.5,
+    "category_in_definition": 0.4,
+    "shared_parent": 0.7,
+    "shared_grandparent": 0.3,
+}
+
+
+def connection_strength(word_a, word_b):
     """
     Simple human-like connection logic - as a person would think:
     1. Same type/category (both animals, plants, foods) -> CONNECT
@@ -361,7 +553,8 @@ def find_connection(word_a, word_b):
     3. Share a category word in definitions (milk mentions "mammals", cow is mammal) -> CONNECT
     4. Share parent category (both mammals, both plants) -> CONNECT
     
-    Returns True if connected through any rule.
+    Returns the strength of the first rule that connects the words (see RULE_STRENGTH),
+    or 0.0 if no rule connects them.
     """
     a_lower = word_a.lower()
     b_lower = word_b.lower()
@@ -371,7 +564,7 @@ def find_connection(word_a, word_b):
         synsets_b = wordnet.synsets(b_lower)
         
         if not synsets_a or not synsets_b:
-            return False
+            return 0.0
         
         syn_a = synsets_a[0]
         syn_b = synsets_b[0]
@@ -388,11 +581,11 @@ def find_connection(word_a, word_b):
         # Special-case dairy: animals produce milk/dairy products
         if (cat_a == "animal" and ("milk" in b_lower or "dairy" in b_lower)) or \
            (cat_b == "animal" and ("milk" in a_lower or "dairy" in a_lower)):
-            return True
+            return RULE_STRENGTH["dairy"]
 
         # Quick substring bridge (e.g., "dairy product" contains "dairy", "cows' milk" contains "milk")
         if a_lower in b_lower or b_lower in a_lower:
-            return True
+            return RULE_STRENGTH["substring"]
         
         # Rule 1: Same semantic category (both animals, both foods, etc.) but skip broad buckets
         if (
@@ -401,13 +594,13 @@ def find_connection(word_a, word_b):
             and cat_a == cat_b
             and cat_a not in broad_categories
         ):
-            return True  # Both same type
+            return RULE_STRENGTH["same_category"]  # Both same type
         
         # Rule 2: One word directly in the other's definition
         if b_lower in def_a or b_lower.replace(' ', '_') in def_a:
-            return True
+            return RULE_STRENGTH["definition"]
         if a_lower in def_b or a_lower.replace(' ', '_') in def_b:
-            return True
+            return RULE_STRENGTH["definition"]
         
         # Rule 3: Manual human-like bridge keywords (focused; drop overly broad ones like "food"/"product")
         bridge_keywords = {"dairy", "farm", "livestock", "milk", "drink", "animal"}
@@ -416,7 +609,7 @@ def find_connection(word_a, word_b):
         # Check if any bridge keyword appears in both definitions or both word forms
         for kw in bridge_keywords:
             if (kw in def_a_words or kw in a_lower) and (kw in def_b_words or kw in b_lower):
-                return True
+                return RULE_STRENGTH["bridge_keyword"]
         
         # Rule 4: Check if B's category/type appears in A's definition and vice versa
         cat_terms = []
@@ -439,10 +632,10 @@ def find_connection(word_a, word_b):
                 if cat in def_b and (cat == cat_a or cat in str(syn_a.hypernyms()).lower()):
                     # Only cross-connect if the other category is in an allowed, non-broad bucket
                     if cat_a and cat_a in allowed_cross and cat_b and cat_b in allowed_cross:
-                        return True
+                        return RULE_STRENGTH["category_in_definition"]
                 if cat in def_a and (cat == cat_b or cat in str(syn_b.hypernyms()).lower()):
                     if cat_b and cat_b in allowed_cross and cat_a and cat_a in allowed_cross:
-                        return True
+                        return RULE_STRENGTH["category_in_definition"]
         
         # Rule 5: Share parent categories at level 1 or 2
         hypers_a = syn_a.hypernyms()
@@ -450,7 +643,7 @@ def find_connection(word_a, word_b):
         
         if hypers_a and hypers_b:
             if set(hypers_a) & set(hypers_b):
-                return True
+                return RULE_STRENGTH["shared_parent"]
         
         # Second-level parents
         hypers_a2 = []
@@ -461,16 +654,416 @@ def find_connection(word_a, word_b):
             hypers_b2.extend(h.hypernyms())
         
         if set(hypers_a2) & set(hypers_b2):
-            return True
+            return RULE_STRENGTH["shared_grandparent"]
             
     except Exception:
         pass
     
-    return False
+    return 0.0
+
+
+def find_connection(word_a, word_b):
+    """Returns True if the words are connected through any rule (see connection_strength)."""
+    return connection_strength(word_a, word_b) > 0
+
+
+# ✅ Static word vectors (lazy, memory-mapped)
+word_vectors = None
+
+def get_word_vectors():
+    """
+    Load the local word-vector file once and keep it memory-mapped.
+    Returns (matrix, vocab_index) or None when no vector file is configured.
+    """
+    global word_vectors
+    if word_vectors is None:
+        if not WORD_VECTORS_PATH or not WORD_VECTORS_VOCAB:
+            return None
+        import numpy as np
+        print(f"Loading word vectors from {WORD_VECTORS_PATH}...")
+        matrix = np.load(WORD_VECTORS_PATH, mmap_mode="r")
+        with open(WORD_VECTORS_VOCAB, encoding="utf-8") as f:
+            vocab = {}
+            for i, line in enumerate(f):
+                w = line.strip().lower()
+                if w and w not in vocab:
+                    vocab[w] = i
+        word_vectors = (matrix, vocab)
+        print(f"Word vectors loaded: {len(vocab)} words, dim {matrix.shape[1]}.")
+    return word_vectors
+
+
+def embed_words(words):
+    """
+    Embed all words at once into a unit-normalised matrix (one row per word).
+    Multi-word phrases ("dairy product") use the mean of their token vectors;
+    words with no known vector get a zero row (find_vector_connections never links them).
+    """
+    import numpy as np
+    matrix, vocab = get_word_vectors()
+    rows = []
+    for word in words:
+        w = word.lower()
+        if w in vocab:
+            rows.append([vocab[w]])
+        elif w.replace(' ', '_') in vocab:
+            rows.append([vocab[w.replace(' ', '_')]])
+        else:
+            rows.append([vocab[t] for t in w.replace('_', ' ').split() if t in vocab])
+
+    # Gather every needed row from the memory map in one fancy-indexing read
+    needed = sorted({i for r in rows for i in r})
+    position = {idx: k for k, idx in enumerate(needed)}
+    gathered = np.asarray(matrix[needed], dtype=np.float32) if needed else None
+
+    emb = np.zeros((len(words), matrix.shape[1]), dtype=np.float32)
+    for k, r in enumerate(rows):
+        if r:
+            emb[k] = gathered[[position[i] for i in r]].mean(axis=0)
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return emb / norms
+
+
+def find_vector_connections(words, threshold=VECTOR_THRESHOLD, top_k=VECTOR_TOP_K):
+    """
+    Link pairs whose cosine similarity is at least `threshold`, computed with a single
+    matmul over the whole constellation. With top_k > 0 each node keeps only its k most
+    similar partners (a pair is linked if either endpoint selects it).
+    Returns a dict mapping index pairs (i, j), i < j, to their similarity.
+    """
+    import numpy as np
+    n = len(words)
+    if n < 2:
+        return {}
+
+    emb = embed_words(words)
+    known = np.linalg.norm(emb, axis=1) > 0
+    sim = emb @ emb.T
+    # Words without a vector (zero rows) sit below any threshold and are never top-k picks
+    sim[~known, :] = -2.0
+    sim[:, ~known] = -2.0
+    np.fill_diagonal(sim, -2.0)
+    mask = (sim >= threshold) & np.outer(known, known)
+
+    if top_k and top_k < n - 1:
+        # Keep only each row's k best columns, then symmetrise
+        best = np.argpartition(-sim, top_k, axis=1)[:, :top_k]
+        keep = np.zeros_like(mask)
+        np.put_along_axis(keep, best, True, axis=1)
+        mask &= keep | keep.T
+
+    ii, jj = np.nonzero(np.triu(mask, k=1))
+    return {(i, j): float(sim[i, j]) for i, j in zip(ii.tolist(), jj.tolist())}
+
+
+def find_semantic_links(words, mode=None, max_edges=None, skip=()):
+    """
+    Return connected word pairs as (i, j, strength), i < j, using the selected engine.
+    Strength is the rule strength (RULE_STRENGTH) or the vector cosine similarity.
+    `words` should be in relevance order; pairs in `skip` are never scored or returned.
+    With max_edges, only the strongest max_edges pairs are kept (bounded min-heap, ties go
+    to earlier words), and the rule scan visits pairs among the most relevant words first,
+    stopping once it has found EDGE_SCAN_FACTOR * max_edges links (the heap keeps the strongest).
+    Falls back to the WordNet rules when no word-vector file is configured.
+    """
+    mode = (mode or CONNECTION_MODE).lower()
+    if mode not in CONNECTION_MODES:
+        raise ValueError(f"Unknown connection mode: {mode}")
+    if max_edges is not None and max_edges <= 0:
+        return []
+
+    vector_pairs = None
+    if mode != "rules":
+        if get_word_vectors() is None:
+            print(f"Connection mode '{mode}' requested but no word vectors configured; using rules.")
+            mode = "rules"
+        else:
+            vector_pairs = {pair: sim for pair, sim in find_vector_connections(words).items() if pair not in skip}
+
+    heap = []   # (strength, -i, -j): the weakest, latest pair sits at heap[0]
+
+    def offer(i, j, strength):
+        item = (strength, -i, -j)
+        if max_edges is None or len(heap) < max_edges:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    if mode == "vectors":
+        for (i, j), sim in vector_pairs.items():
+            offer(i, j, sim)
+    elif mode == "intersection":
+        # Only confirm vector candidates with the rules - no all-pairs Python loop
+        for (i, j), sim in vector_pairs.items():
+            strength = connection_strength(words[i], words[j])
+            if strength > 0:
+                offer(i, j, min(sim, strength))
+    else:
+        vector_pairs = vector_pairs or {}
+        for (i, j), sim in vector_pairs.items():
+            offer(i, j, sim)
+        # Only links found count towards the stop, so sparse pools are still scanned in full
+        found_left = None if max_edges is None else max(1, EDGE_SCAN_FACTOR) * max_edges
+        # Pairs among the first k words come before any pair involving word k+1
+        for j in range(1, len(words)):
+            for i in range(j):
+                if (i, j) in vector_pairs or (i, j) in skip:
+                    continue
+                strength = connection_strength(words[i], words[j])
+                if strength > 0:
+                    offer(i, j, strength)
+                    if found_left is not None:
+                        found_left -= 1
+                        if found_left == 0:
+                            break
+            if found_left == 0:
+                break
+
+    return sorted((-i, -j, strength) for strength, i, j in heap)
+
+
+def rank_expansions(candidates, seeds, budget):
+    """
+    Return up to `budget` expansion candidates (all when budget is None), most relevant first.
+    `candidates` maps word -> (first seed, number of seeds that expanded to it).
+    Seeds take turns, so one seed can't fill the whole budget. Within a seed, words reached
+    from more seeds come first, then words sharing more WordNet categories with the seeds,
+    then alphabetical order.
+    """
+    seed_categories = set()
+    for seed in seeds:
+        seed_categories.update(get_wordnet_categories(seed))
+
+    def relevance(word):
+        _, seed_count = candidates[word]
+        shared = len(seed_categories.intersection(get_wordnet_categories(word)))
+        return (-seed_count, -shared, word)
+
+    per_seed = {seed: [] for seed in seeds}
+    for word, (seed, _) in candidates.items():
+        per_seed.setdefault(seed, []).append(word)
+    limit = len(candidates) if budget is None else budget
+    picks = [iter(heapq.nsmallest(limit, words, key=relevance)) for words in per_seed.values() if words]
+
+    ranked = []
+    while picks and len(ranked) < limit:
+        for pick in list(picks):
+            word = next(pick, None)
+            if word is None:
+                picks.remove(pick)
+            elif len(ranked) < limit:
+                ranked.append(word)
+    return ranked
+
+
+def resolve_budget(name, requested, default):
+    """Per-request node/edge budget: positive JSON integer, never above the server default (0 = unlimited)."""
+    if requested is None:
+        return default or None
+    if isinstance(requested, bool) or not isinstance(requested, int) or requested <= 0:
+        raise ValueError(f"{name} must be a positive integer")
+    return min(requested, default) if default else requested
+
+
+# ✅ Profiling
+# cProfile and tracemalloc are process-wide, so only one request is profiled at a time;
+# requests arriving meanwhile simply run unprofiled.
+_profile_lock = threading.Lock()
+# process_words reseeds the global RNG per input, so sampling needs its own generator
+_profile_rng = random.Random()
+
+class StackSampler:
+    """Statistical sampler: snapshots one thread's stack every interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval_ms):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class RequestProfile:
+    """Profiles one request: CPU (sampler or cProfile) plus tracemalloc peak per stage."""
+
+    def __init__(self, name, mode):
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now * 1000) % 1000:03d}"
+        self.run_id = f"{stamp}-{name}-{uuid.uuid4().hex[:8]}"
+        self.mode = mode
+        self.stages = []
+        self._profiler = None
+
+    def start(self):
+        tracemalloc.start()
+        if self.mode == "cprofile":
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS)
+            self._profiler.start()
+        self._started = self._last = time.perf_counter()
+
+    def mark(self, stage):
+        """Close the current stage: record its duration and peak allocation, then reset the peak."""
+        now = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+        self.stages.append({
+            "stage": stage,
+            "ms": round((now - self._last) * 1000, 2),
+            "peak_alloc_kb": round(peak / 1024, 1),
+        })
+        tracemalloc.reset_peak()
+        self._last = now
+
+    def stop(self):
+        total_ms = round((time.perf_counter() - self._started) * 1000, 2)
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        tracemalloc.stop()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, self.run_id)
+        if self.mode == "cprofile":
+            self._profiler.dump_stats(base + ".prof")
+        else:
+            with open(base + ".collapsed", "w", encoding="utf-8") as f:
+                f.write(self._profiler.collapsed())
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({"run_id": self.run_id, "mode": self.mode, "total_ms": total_ms, "stages": self.stages}, f, indent=2)
+        rotate_profiles()
+
+
+def list_profile_runs():
+    """Run ids in PROFILE_DIR, oldest first (by summary file mtime, then run id)."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    runs = []
+    for f in os.listdir(PROFILE_DIR):
+        if f.endswith(".json"):
+            try:
+                runs.append((os.stat(os.path.join(PROFILE_DIR, f)).st_mtime_ns, f[:-len(".json")]))
+            except FileNotFoundError:
+                pass  # removed by a concurrent rotation
+    return [run_id for _, run_id in sorted(runs)]
+
+
+def rotate_profiles():
+    """Keep only the newest PROFILE_MAX_RUNS runs in PROFILE_DIR."""
+    runs = list_profile_runs()
+    for run_id in runs[:-PROFILE_MAX_RUNS] if PROFILE_MAX_RUNS > 0 else runs:
+        for ext in (".json", ".collapsed", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, run_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+def profile_stage(stage):
+    """Mark the end of a stage in the current request's profile (no-op when not profiled)."""
+    profile = g.get("profile")
+    if profile is not None:
+        profile.mark(stage)
+
+
+def is_admin_request():
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+def profile_forced():
+    """PROFILE_HEADER set to 1/true, from a caller holding the admin token."""
+    return request.headers.get(PROFILE_HEADER, "").strip().lower() in ("1", "true") and is_admin_request()
+
+
+def profiled(view):
+    """Profile a sampled fraction of requests, or admin requests carrying PROFILE_HEADER."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        settings = profiling_settings
+        wanted = settings["enabled"] and (
+            _profile_rng.random() < settings["sample_rate"] or profile_forced()
+        )
+        if not wanted or not _profile_lock.acquire(blocking=False):
+            return view(*args, **kwargs)
+        try:
+            g.profile = RequestProfile(request.endpoint or "request", settings["mode"])
+            g.profile.start()
+            try:
+                response = make_response(view(*args, **kwargs))
+            finally:
+                try:
+                    g.profile.stop()
+                except Exception as e:
+                    print(f"Failed to write profile: {e}")
+            response.headers["X-MindMap-Profile-Id"] = g.profile.run_id
+            return response
+        finally:
+            g.pop("profile", None)
+            _profile_lock.release()
+    return wrapper
+
+
+@app.route("/admin/profiling", methods=["GET", "POST"])
+def admin_profiling():
+    """Inspect or change profiling settings at runtime. Requires the X-Admin-Token header."""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        updated = dict(profiling_settings)
+        if "enabled" in data:
+            if not isinstance(data["enabled"], bool):
+                return jsonify({"error": "enabled must be true or false"}), 400
+            updated["enabled"] = data["enabled"]
+        if "sample_rate" in data:
+            if isinstance(data["sample_rate"], bool):
+                return jsonify({"error": "sample_rate must be a number"}), 400
+            try:
+                updated["sample_rate"] = float(data["sample_rate"])
+            except (TypeError, ValueError):
+                return jsonify({"error": "sample_rate must be a number"}), 400
+            if not 0 <= updated["sample_rate"] <= 1:
+                return jsonify({"error": "sample_rate must be between 0 and 1"}), 400
+        if "mode" in data:
+            if data["mode"] not in PROFILE_MODES:
+                return jsonify({"error": f"mode must be one of {', '.join(PROFILE_MODES)}"}), 400
+            updated["mode"] = data["mode"]
+        profiling_settings.update(updated)
+
+    recent_runs = list_profile_runs()[::-1][:10]
+    return jsonify({**profiling_settings, "profile_dir": PROFILE_DIR, "recent_runs": recent_runs})
 
 
 # ✅ Main Route - REDESIGNED for rich constellations
 @app.route("/process", methods=["POST"])
+@profiled
 def process_words():
     try:
         data = request.get_json()
@@ -478,21 +1071,48 @@ def process_words():
             return jsonify({"error": "No words provided"}), 400
 
         input_words = [word.strip().lower() for word in data.get("words", "").split(",") if word.strip()]
+        connection_mode = data.get("connection_mode") or CONNECTION_MODE
+        if str(connection_mode).lower() not in CONNECTION_MODES:
+            return jsonify({"error": f"connection_mode must be one of {', '.join(CONNECTION_MODES)}"}), 400
+        try:
+            max_nodes = resolve_budget("max_nodes", data.get("max_nodes"), MAX_NODES)
+            max_edges = resolve_budget("max_edges", data.get("max_edges"), MAX_EDGES)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Step 1: Expand each input word to a pool of related words
         word_pool = {}          # word -> type (input/expanded)
         seed_links = []         # keep track of seed-to-expansion links
         
+        seeds = []
         for inp_word in input_words:
             translated = detect_and_translate(inp_word).lower()
             word_pool[translated] = "input"
-            
-            # Expand to related words
-            expanded = expand_word_to_pool(translated, max_expansions=6)
-            for exp_word in expanded:
-                if exp_word not in word_pool:
-                    word_pool[exp_word] = "expanded"
-                    seed_links.append((translated, exp_word))
+            seeds.append(translated)
+        
+        # Expand to related words, only as far as the node budget allows
+        # Every expansion needs its seed link, so the edge budget also caps how many can be kept
+        expansion_budget = None if max_nodes is None else max(0, max_nodes - len(word_pool))
+        if max_edges is not None:
+            expansion_budget = max_edges if expansion_budget is None else min(expansion_budget, max_edges)
+        candidates = {}         # word -> (first seed, number of seeds)
+        if expansion_budget != 0:
+            for n, translated in enumerate(seeds):
+                expanded = expand_word_to_pool(translated, max_expansions=6)
+                for exp_word in expanded:
+                    if exp_word in seeds[n + 1:]:
+                        seed_links.append((translated, exp_word))  # expands to a later input
+                    elif exp_word in candidates:
+                        seed, count = candidates[exp_word]
+                        candidates[exp_word] = (seed, count + 1)
+                    elif exp_word not in word_pool:
+                        candidates[exp_word] = (translated, 1)
+        
+        # Kept expansions enter the pool most relevant first, so word_pool is in relevance order
+        for exp_word in rank_expansions(candidates, seeds, expansion_budget):
+            word_pool[exp_word] = "expanded"
+            seed_links.append((candidates[exp_word][0], exp_word))
+        profile_stage("expand")
         # Build suggestions for all nodes, excluding words already in the constellation
         suggestions_map = {}
         existing_set = set(word_pool.keys())
@@ -511,6 +1131,7 @@ def process_words():
                     unique_filtered.append(e)
             suggestions_map[w] = unique_filtered[:3]
         
+        profile_stage("suggestions")
         # Step 2: Create nodes for all words
         nodes = []
         existing_nodes = set()
@@ -533,26 +1154,26 @@ def process_words():
             })
             existing_nodes.add(word)
         
+        profile_stage("nodes")
         # Step 3: Connect all words
         links = []
         all_words = list(word_pool.keys())
         
-        # 3a. Seed-to-expansion links (guarantee local constellation)
-        for src, tgt in seed_links:
+        # 3a. Seed-to-expansion links (guarantee local constellation, first claim on the edge budget)
+        for src, tgt in seed_links[:max_edges]:
             links.append({"source": src, "target": tgt, "relation": "seed"})
         
-        # 3b. Semantic links across all words
-        for i in range(len(all_words)):
-            for j in range(i + 1, len(all_words)):
-                word_i = all_words[i]
-                word_j = all_words[j]
-                
-                if find_connection(word_i, word_j):
-                    links.append({
-                        "source": word_i,
-                        "target": word_j,
-                        "relation": "related"
-                    })
+        # 3b. Semantic links across all words (rules and/or word vectors), strongest first within budget;
+        #     pairs that already have a seed link are skipped so they don't use up the budget
+        edge_budget = None if max_edges is None else max_edges - len(links)
+        index = {w: k for k, w in enumerate(all_words)}
+        seeded = {tuple(sorted((index[l["source"]], index[l["target"]]))) for l in links}
+        for i, j, _ in find_semantic_links(all_words, connection_mode, edge_budget, skip=seeded):
+            links.append({
+                "source": all_words[i],
+                "target": all_words[j],
+                "relation": "related"
+            })
         
         # Remove duplicates
         unique_links = {(l["source"], l["target"], l["relation"]) for l in links}
@@ -563,9 +1184,12 @@ def process_words():
         for l in links:
             degree[l["source"]] = degree.get(l["source"], 0) + 1
             degree[l["target"]] = degree.get(l["target"], 0) + 1
-        keep_nodes = set(w for w in word_pool.keys() if w in input_words or degree.get(w, 0) > 0)
+        keep_nodes = set(w for w in word_pool.keys() if word_pool[w] == "input" or degree.get(w, 0) > 0)
         links = [l for l in links if l["source"] in keep_nodes and l["target"] in keep_nodes]
+        nodes = [n for n in nodes if n["id"] in keep_nodes]
+        suggestions_map = {w: s for w, s in suggestions_map.items() if w in keep_nodes}
         
+        profile_stage("connect")
         # FULLY DYNAMIC career suggestions - works for ANY words using pure semantic analysis
         career_tags_set = set()
         import random
@@ -573,67 +1197,6 @@ def process_words():
         
         all_node_words = [n["id"] for n in nodes]
         
-        # Pure semantic field detection from WordNet - NO hardcoded mappings
-        def detect_semantic_domain(word):
-            """Dynamically detect semantic domain for ANY word using WordNet analysis"""
-            domains = []
-            try:
-                synsets = wordnet.synsets(word.lower())
-                if not synsets:
-                    return domains
-                
-                syn = synsets[0]  # Most common meaning
-                definition = syn.definition().lower()
-                lexname = syn.lexname()  # e.g., 'noun.animal', 'verb.motion'
-                
-                # Extract domain from lexname
-                if '.' in lexname:
-                    category = lexname.split('.')[1]
-                    domains.append(category)
-                
-                # Analyze hypernym chain (up to 3 levels)
-                current = syn
-                for _ in range(3):
-                    hypers = current.hypernyms()
-                    if not hypers:
-                        break
-                    current = hypers[0]
-                    hyper_lexname = current.lexname()
-                    if '.' in hyper_lexname:
-                        cat = hyper_lexname.split('.')[1]
-                        domains.append(cat)
-                
-                # Mine definition for domain keywords
-                domain_keywords = {
-                    'animal': ['animal', 'mammal', 'creature', 'livestock', 'fauna', 'vertebrate', 'beast'],
-                    'plant': ['plant', 'vegetation', 'flora', 'tree', 'flower', 'crop', 'botanical'],
-                    'food': ['food', 'nutrient', 'dish', 'meal', 'beverage', 'drink', 'edible', 'cuisine'],
-                    'health': ['medicine', 'treatment', 'disease', 'health', 'medical', 'therapy', 'cure'],
-                    'technology': ['device', 'machine', 'computer', 'software', 'digital', 'electronic', 'system'],
-                    'science': ['science', 'research', 'study', 'analysis', 'experiment', 'theory'],
-                    'art': ['art', 'creative', 'design', 'aesthetic', 'visual', 'artistic'],
-                    'music': ['music', 'sound', 'audio', 'instrument', 'melody', 'song'],
-                    'business': ['business', 'commerce', 'trade', 'market', 'company', 'enterprise'],
-                    'engineering': ['engineering', 'construction', 'build', 'structure', 'technical'],
-                    'education': ['education', 'teaching', 'learning', 'school', 'instruction'],
-                    'communication': ['communication', 'language', 'speech', 'writing', 'media'],
-                    'social': ['social', 'people', 'community', 'society', 'human'],
-                    'law': ['law', 'legal', 'court', 'justice', 'attorney'],
-                    'transportation': ['vehicle', 'transport', 'travel', 'motion', 'conveyance'],
-                    'environment': ['environment', 'ecology', 'nature', 'climate', 'conservation'],
-                    'finance': ['finance', 'money', 'bank', 'investment', 'economic', 'financial'],
-                    'sport': ['sport', 'athletic', 'fitness', 'exercise', 'game', 'competition'],
-                }
-                
-                for domain, keywords in domain_keywords.items():
-                    if any(kw in definition for kw in keywords):
-                        domains.append(domain)
-                
-            except Exception:
-                pass
-            
-            return list(set(domains))
-        
         # Detect domains for ALL words in constellation
         word_domains = {}
         for word in all_node_words:
@@ -686,10 +1249,12 @@ def process_words():
                 sample_size = min(3, len(jobs))
                 career_tags_set.update(random.sample(jobs, sample_size))
         
+        profile_stage("careers")
         career_tags = sorted(career_tags_set)[:15]
         economy_tags = generate_economic_tags(input_words)
         trendy_tags = generate_trendy_topics(input_words)
         
+        profile_stage("tags")
         response = {
             "nodes": [{"id": n["id"], "categories": n["categories"]} for n in nodes],
             "links": links,
@@ -1,23 +1,42 @@
 import sys
+import os
 import json
-from transformers import pipeline
 import random
+import time
+import collections
+import argparse
+import threading
+import itertools
+import signal
+import socketserver
+import multiprocessing as mp
+from multiprocessing import connection as mp_connection
 
-print("Loading NLP model...")  # ✅ Debug: See if model starts loading
-sys.stdout.flush()
 
-# Load the NLP model
-nlp_model = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+def log(*args):
+    # In worker mode stdout carries the JSON-lines protocol, so debug output goes to stderr
+    print(*args, file=sys.stderr)
+    sys.stderr.flush()
+
+
+# Load the NLP model lazily, once per process
+nlp_model = None
+
+def get_nlp_model():
+    global nlp_model
+    if nlp_model is None:
+        log("Loading NLP model...")
+        from transformers import pipeline
+        nlp_model = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+        log("Model loaded successfully.")
+    return nlp_model
 
-print("Model loaded successfully.")  # ✅ Debug: See if model loads
-sys.stdout.flush()
 
 def analyze_words(words):
     words_list = words.split(",")  # Split input words by comma
     words_list = [word.strip() for word in words_list]
 
-    print("Processing words:", words_list)  # ✅ Debug
-    sys.stdout.flush()
+    log("Processing words:", words_list)
 
     # Example of randomly generated links for demo
     links = []
@@ -31,21 +50,407 @@ def analyze_words(words):
     # Generate some suggested words for demo purposes
     suggested_words = [random.choice(words_list) + "ly", random.choice(words_list) + "ness"]
 
-    result = {
+    return {
         "nodes": nodes,
         "links": links,
         "suggested_words": suggested_words
     }
-    
-    print(json.dumps(result))
-    sys.stdout.flush()
 
-if __name__ == "__main__":
+
+# ✅ Worker process: load the model once, then answer one job at a time
+def worker_main(worker_id, generation, jobs, results):
+    # jobs / results are this worker's own pipe ends: nothing is shared with other workers,
+    # so a worker dying mid-write can't wedge a lock the others (or its replacement) need
+    try:
+        get_nlp_model()
+    except Exception as e:
+        results.send(("failed", worker_id, generation, f"{type(e).__name__}: {e}"))
+        sys.exit(1)
+    results.send(("ready", worker_id, generation, None))
+
+    while True:
+        try:
+            job = jobs.recv()
+        except EOFError:
+            break  # supervisor went away
+        if job is None:
+            break
+        job_id, words, enqueued_at = job
+        started_at = time.time()
+        try:
+            result, error = analyze_words(words), None
+        except Exception as e:
+            result, error = None, str(e)
+        results.send(("done", worker_id, generation, {
+            "job_id": job_id,
+            "result": result,
+            "error": error,
+            "queue_ms": round((started_at - enqueued_at) * 1000, 1),
+            "run_ms": round((time.time() - started_at) * 1000, 1),
+        }))
+
+
+# ✅ Supervisor: owns the worker processes, hands each idle worker one job and routes responses back
+class Supervisor:
+    def __init__(self, workers=1, max_restarts=5, job_timeout=120.0):
+        self.ctx = mp.get_context("spawn")
+        self.num_workers = workers
+        self.max_restarts = max_restarts    # consecutive crashes/load failures before giving up on a worker
+        self.job_timeout = job_timeout      # backstop: fail jobs unanswered after this many seconds
+        self.workers = {}       # worker_id -> state dict (proc, generation, pipes, current job, ...)
+        self.backlog = collections.deque()  # jobs not yet handed to a worker
+        self.pending = {}       # job_id -> (request_id, reply, enqueued_at)
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.all_ready = threading.Event()  # every worker has either loaded the model or been given up
+        self.drained = threading.Condition(self.lock)
+        self.stopping = False
+
+    def start(self):
+        for worker_id in range(self.num_workers):
+            self.workers[worker_id] = {
+                "proc": None, "generation": 0, "jobs": None, "results": None, "job": None,
+                "ready": False, "failures": 0, "restart_at": None, "gave_up": False,
+            }
+            self._spawn(worker_id)
+        threading.Thread(target=self._collect, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+
+    def _spawn(self, worker_id):
+        # Called with self.lock held, or before the supervisor threads start.
+        # Fresh pipes per generation keep a dead worker's messages away from its replacement.
+        state = self.workers[worker_id]
+        for conn in (state["jobs"], state["results"]):
+            if conn is not None:
+                conn.close()
+        state["generation"] += 1
+        job_reader, state["jobs"] = self.ctx.Pipe(duplex=False)
+        state["results"], result_writer = self.ctx.Pipe(duplex=False)
+        state["job"] = None
+        state["ready"] = False
+        state["restart_at"] = None
+        state["proc"] = self.ctx.Process(
+            target=worker_main,
+            args=(worker_id, state["generation"], job_reader, result_writer),
+            daemon=True,
+        )
+        state["proc"].start()
+        # Drop the child's ends here so a dead worker shows up as EOF on its results pipe
+        job_reader.close()
+        result_writer.close()
+
+    def _dispatch(self):
+        # Called with self.lock held: hand backlog jobs to idle, ready workers
+        for state in self.workers.values():
+            if not self.backlog:
+                return
+            if state["ready"] and state["job"] is None and not state["gave_up"]:
+                job = self.backlog.popleft()
+                try:
+                    state["jobs"].send(job)
+                except OSError:
+                    self.backlog.appendleft(job)  # worker just died; _monitor restarts it
+                    state["ready"] = False
+                    continue
+                state["job"] = job[0]
+
+    def _check_startup(self):
+        # Called with self.lock held
+        if all(state["ready"] or state["gave_up"] for state in self.workers.values()):
+            self.all_ready.set()
+
+    def _monitor(self):
+        # Restart crashed workers with backoff, fail the job they held, and expire stale jobs
+        while not self.stopping:
+            time.sleep(0.5)
+            failed = []
+            now = time.time()
+            with self.lock:
+                for worker_id, state in self.workers.items():
+                    if state["gave_up"] or self.stopping:
+                        continue
+                    if state["restart_at"] is not None:
+                        if now >= state["restart_at"]:
+                            self._spawn(worker_id)
+                        continue
+                    if state["proc"].is_alive():
+                        continue
+                    if state["job"] is not None:
+                        failed.append((state["job"], "worker crashed"))
+                    state["ready"] = False
+                    state["failures"] += 1
+                    if state["failures"] > self.max_restarts:
+                        log(f"Worker {worker_id} failed {state['failures']} times in a row; giving up on it.")
+                        state["gave_up"] = True
+                        self._check_startup()
+                    else:
+                        delay = min(2 ** (state["failures"] - 1), 30)
+                        log(f"Worker {worker_id} exited with code {state['proc'].exitcode}; "
+                            f"restarting in {delay}s.")
+                        state["restart_at"] = now + delay
+
+                if all(state["gave_up"] for state in self.workers.values()):
+                    # Nobody left to run anything: answer everything still waiting
+                    failed.extend((job[0], "no model workers available") for job in self.backlog)
+                    self.backlog.clear()
+                else:
+                    self._dispatch()
+
+                expired = {job_id for job_id, (_, _, enqueued_at) in self.pending.items()
+                           if now - enqueued_at > self.job_timeout}
+                if expired:
+                    failed.extend((job_id, f"timed out after {self.job_timeout:g}s") for job_id in expired)
+                    self.backlog = collections.deque(job for job in self.backlog if job[0] not in expired)
+                    for worker_id, state in self.workers.items():
+                        if state["job"] in expired and state["proc"].is_alive():
+                            # A hung job would keep this worker busy forever: kill it and let
+                            # the crash path above restart it on the next pass
+                            log(f"Worker {worker_id} timed out on job {state['job']}; terminating it.")
+                            state["job"] = None
+                            state["proc"].terminate()
+
+            for job_id, error in failed:
+                self._finish(job_id, {"error": error})
+
+    def _collect(self):
+        while not self.stopping:
+            with self.lock:
+                conns = [state["results"] for state in self.workers.values()
+                         if state["results"] is not None and not state["results"].closed]
+            # Short timeout so pipes of freshly spawned workers are picked up promptly
+            for conn in mp_connection.wait(conns, timeout=0.2):
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    with self.lock:
+                        if not conn.closed:
+                            conn.close()  # worker exited; _monitor handles the restart
+                    continue
+                self._handle_message(*message)
+
+    def _handle_message(self, kind, worker_id, generation, payload):
+        with self.lock:
+            state = self.workers[worker_id]
+            if generation != state["generation"]:
+                return  # stale message from a worker that has since been replaced
+            if kind == "ready":
+                state["ready"] = True
+                self._check_startup()
+                self._dispatch()
+            elif kind == "failed":
+                log(f"Worker {worker_id} could not load the model: {payload}")
+            elif kind == "done":
+                state["job"] = None
+                state["failures"] = 0
+                self._dispatch()
+        if kind == "ready":
+            log(f"Worker {worker_id} ready.")
+        elif kind == "done":
+            response = {"timing": {
+                "queue_ms": payload["queue_ms"],
+                "run_ms": payload["run_ms"],
+                "worker": worker_id,
+            }}
+            if payload["error"] is not None:
+                response["error"] = payload["error"]
+            else:
+                response["result"] = payload["result"]
+            self._finish(payload["job_id"], response)
+
+    def _finish(self, job_id, response):
+        with self.lock:
+            entry = self.pending.get(job_id)
+        if entry is None:
+            return
+        request_id, reply, enqueued_at = entry
+        response = {"id": request_id, **response}
+        response.setdefault("timing", {})["total_ms"] = round((time.time() - enqueued_at) * 1000, 1)
+        reply(response)
+        # Only count the job as drained once its response has been written
+        with self.lock:
+            self.pending.pop(job_id, None)
+            self.drained.notify_all()
+
+    def submit(self, words, request_id, reply):
+        job_id = next(self.job_ids)
+        enqueued_at = time.time()
+        with self.lock:
+            self.pending[job_id] = (request_id, reply, enqueued_at)
+            available = not all(state["gave_up"] for state in self.workers.values())
+            if available:
+                self.backlog.append((job_id, words, enqueued_at))
+                self._dispatch()
+        if not available:
+            self._finish(job_id, {"error": "no model workers available"})
+        return job_id
+
+    def status(self):
+        with self.lock:
+            ready = sum(1 for state in self.workers.values() if state["ready"])
+            return {
+                "ready": ready > 0,
+                "workers": self.num_workers,
+                "workers_ready": ready,
+                "workers_failed": sum(1 for state in self.workers.values() if state["gave_up"]),
+                "queue_depth": len(self.backlog),
+                "in_flight": len(self.pending),
+            }
+
+    def handle_line(self, line, reply):
+        """
+        Handle one JSON-lines request: {"id": ..., "words": "a,b"} or {"op": "status"}.
+        Returns the job id when the request was queued, otherwise None.
+        """
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            reply({"error": f"invalid JSON: {e}"})
+            return None
+        if not isinstance(request, dict):
+            reply({"error": "request must be a JSON object"})
+            return None
+        if request.get("op") == "status":
+            reply({"id": request.get("id"), "status": self.status()})
+            return None
+        words = request.get("words")
+        if not isinstance(words, str) or not words.strip():
+            reply({"id": request.get("id"), "error": "No words provided"})
+            return None
+        return self.submit(words, request.get("id"), reply)
+
+    def wait_drained(self, job_ids=None):
+        """Block until every pending job (or every job in `job_ids`) has been answered."""
+        with self.lock:
+            if job_ids is None:
+                self.drained.wait_for(lambda: not self.pending)
+            else:
+                self.drained.wait_for(lambda: not (job_ids & self.pending.keys()))
+
+    def stop(self):
+        with self.lock:
+            self.stopping = True
+            states = list(self.workers.values())
+        for state in states:
+            if state["proc"] is not None and state["proc"].is_alive():
+                try:
+                    state["jobs"].send(None)
+                except OSError:
+                    pass
+        for state in states:
+            if state["proc"] is not None:
+                state["proc"].join(timeout=5)
+
+
+def line_writer(write, flush, encode=False):
+    lock = threading.Lock()
+
+    def reply(obj):
+        data = json.dumps(obj) + "\n"
+        with lock:
+            write(data.encode("utf-8") if encode else data)
+            flush()
+    return reply
+
+
+def serve_stdin(supervisor):
+    reply = line_writer(sys.stdout.write, sys.stdout.flush)
+    announced = threading.Lock()
+
+    def announce():
+        # Written exactly once: when startup settles, or at shutdown if that comes first
+        if announced.acquire(blocking=False):
+            status = supervisor.status()
+            reply({"event": "ready" if status["ready"] else "failed", **status})
+
+    threading.Thread(target=lambda: (supervisor.all_ready.wait(), announce()), daemon=True).start()
+    for line in sys.stdin:
+        supervisor.handle_line(line, reply)
+    supervisor.wait_drained()
+    announce()
+
+
+def serve_socket(supervisor, path):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write = line_writer(self.wfile.write, self.wfile.flush, encode=True)
+
+            def reply(obj):
+                try:
+                    write(obj)
+                except OSError:
+                    pass  # client went away
+
+            mine = set()
+            for raw in self.rfile:
+                job_id = supervisor.handle_line(raw.decode("utf-8", "replace"), reply)
+                if job_id is not None:
+                    mine.add(job_id)
+            # Keep the connection open until this client's requests are answered
+            supervisor.wait_drained(mine)
+
+    if os.path.exists(path):
+        os.remove(path)
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    log(f"Listening on {path}")
+    threading.Thread(target=lambda: (supervisor.all_ready.wait(), log("Workers started:", supervisor.status())),
+                     daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def run_once(words):
     print("Script started...")  # ✅ Debug
     sys.stdout.flush()
 
-    words = sys.argv[1]
-    analyze_words(words)
+    get_nlp_model()
+    print(json.dumps(analyze_words(words)))
+    sys.stdout.flush()
 
     print("Script finished.")  # ✅ Debug
     sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the model once on a word list, or as a persistent JSON-lines worker.")
+    parser.add_argument("words", nargs="?", help="comma-separated words (one-shot mode)")
+    parser.add_argument("--serve", action="store_true", help="serve JSON-lines requests on stdin/stdout")
+    parser.add_argument("--socket", help="serve JSON-lines requests on this Unix socket path instead of stdin")
+    parser.add_argument("--workers", type=int, default=1, help="number of model worker processes")
+    parser.add_argument("--max-restarts", type=int, default=5,
+                        help="consecutive crashes or model-load failures before a worker is given up")
+    parser.add_argument("--job-timeout", type=float, default=120.0,
+                        help="fail requests still unanswered after this many seconds")
+    args = parser.parse_args(argv)
+
+    if args.words is not None and not (args.serve or args.socket):
+        run_once(args.words)
+        return 0
+    if not (args.serve or args.socket):
+        parser.error("provide a word list, --serve or --socket")
+
+    supervisor = Supervisor(workers=max(1, args.workers), max_restarts=max(0, args.max_restarts),
+                            job_timeout=args.job_timeout)
+    supervisor.start()
+    try:
+        if args.socket:
+            serve_socket(supervisor, args.socket)
+        else:
+            serve_stdin(supervisor)
+    finally:
+        supervisor.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())